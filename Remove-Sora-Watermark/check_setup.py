@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """Check if setup is complete and dependencies are installed."""
 
+import shutil
+import subprocess
 import sys
+from importlib.util import find_spec
 from pathlib import Path
 
 def check_python_version():
@@ -14,31 +17,36 @@ def check_python_version():
     return True
 
 def check_import(module_name, package_name=None):
-    """Check if a module can be imported."""
+    """Check if a module can be imported (locates it without executing it)."""
     try:
-        __import__(module_name)
+        found = find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        found = False
+    if found:
         print(f"✓ {package_name or module_name} installed")
         return True
-    except ImportError:
-        print(f"❌ {package_name or module_name} not installed")
-        return False
+    print(f"❌ {package_name or module_name} not installed")
+    return False
 
-def check_ffmpeg():
-    """Check if ffmpeg is available."""
-    import subprocess
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], 
-                               capture_output=True, 
-                               timeout=5)
-        if result.returncode == 0:
-            print("✓ FFmpeg installed")
-            return True
-        else:
-            print("❌ FFmpeg not found")
-            return False
-    except (FileNotFoundError, subprocess.TimeoutExpired):
+def check_ffmpeg(deep=False):
+    """Check if ffmpeg is available on PATH (run it only when deep=True)."""
+    path = shutil.which('ffmpeg')
+    if path is None:
         print("❌ FFmpeg not found")
         return False
+    if deep:
+        try:
+            result = subprocess.run([path, '-version'], 
+                                   capture_output=True, 
+                                   timeout=5)
+            if result.returncode != 0:
+                print("❌ FFmpeg not working")
+                return False
+        except (OSError, subprocess.TimeoutExpired):
+            print("❌ FFmpeg not working")
+            return False
+    print("✓ FFmpeg installed")
+    return True
 
 def check_folders():
     """Check if required folders exist."""
@@ -60,7 +68,9 @@ def check_folders():
     return True
 
 def main():
-    """Run all checks."""
+    """Run all checks. Pass --deep to also launch ffmpeg."""
+    deep = "--deep" in sys.argv[1:]
+    
     print("Checking setup...")
     print("-" * 60)
     
@@ -69,7 +79,7 @@ def main():
         check_import("watchdog", "watchdog"),
         check_import("loguru", "loguru"),
         check_import("sorawm", "sorawm (local package)"),
-        check_ffmpeg(),
+        check_ffmpeg(deep),
         check_folders(),
     ]
     
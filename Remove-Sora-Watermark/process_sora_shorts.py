@@ -4,15 +4,20 @@ Manual script to find and process all Sora shorts in YYYYMMDD_TIME format.
 This is separate from the automatic watcher - run this when you want to batch process existing files.
 """
 
+import argparse
+import os
 import re
 import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 
 # Python 3.13 compatibility shim for imghdr
-if sys.version_info >= (3, 13):
+if sys.version_info >= (3, 13) and 'imghdr' not in sys.modules:
     try:
-        import imghdr_compat
+        import imghdr_compat  # noqa: F401
     except ImportError:
         pass
 
@@ -23,106 +28,122 @@ from sorawm.core import SoraWM
 
 
 # Pattern: YYYYMMDD_TIME_*.mp4 (8 digits, underscore, time, underscore, anything, .mp4)
-PATTERN = re.compile(r'^(\d{8})_(\d+)_')
+PATTERN = re.compile(r'^(\d{8})_(\d+)_', re.ASCII)
 
+# loguru sink id for the log file, so repeated main() calls don't stack sinks
+_log_sink_id: int | None = None
 
-def extract_filename_prefix(filename: str) -> str | None:
-    """
-    Extract the prefix up to the second underscore for renaming.
-    
-    Example: '20251104_1209_01k97zny35f599pp7dpv6tk1wc.mp4' -> '20251104_1209'
-    
-    Args:
-        filename: The input filename
-        
-    Returns:
-        Prefix string up to second underscore, or None if pattern doesn't match
-    """
-    match = PATTERN.match(filename)
-    if match:
-        year_month_day = match.group(1)
-        time_part = match.group(2)
-        return f"{year_month_day}_{time_part}"
+# ffmpeg uses several threads per encode; leave each worker process this many cores
+FFMPEG_THREADS_PER_WORKER = 4
+
+
+def _fast_match(name: str) -> re.Match | None:
+    """Match PATTERN, rejecting names that cannot match before running the regex."""
+    if len(name) > 10 and name[8] == '_':
+        return PATTERN.match(name)
     return None
 
 
-def generate_output_filename(input_filename: str) -> str:
+def _scandir_mp4(path: str) -> Iterator[tuple[os.DirEntry, str]]:
     """
-    Generate output filename with wr_ prefix.
+    Recursively yield directory entries for MP4 files matching PATTERN.
+    
+    Filters on the entry name before any Path object is built, so non-matching
+    files and intermediate directories cost no extra stat calls. The walk stays
+    on plain string paths; callers wrap only the yielded entries in Path. The
+    output filename (wr_YYYYMMDD_TIME.mp4) is built from the same match, so
+    callers never re-run the regex.
     
     Args:
-        input_filename: Original filename
+        path: Directory to walk, as a string path
         
-    Returns:
-        New filename: wr_YYYYMMDD_TIME.mp4
+    Yields:
+        Tuples of (os.DirEntry, output_filename) for each matching video file
     """
-    prefix = extract_filename_prefix(input_filename)
-    if prefix:
-        return f"wr_{prefix}.mp4"
-    # Fallback: add wr_ prefix to original name
-    return f"wr_{input_filename}"
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _scandir_mp4(entry.path)
+                elif entry.name.endswith('.mp4'):
+                    m = _fast_match(entry.name)
+                    if m:
+                        yield entry, f"wr_{m[1]}_{m[2]}.mp4"
+    except PermissionError:
+        logger.debug(f"Skipping unreadable folder: {path}")
 
 
-def find_sora_shorts(search_folder: Path) -> List[Path]:
+def iter_unprocessed(
+    search_folder: Path,
+    output_folder: Path,
+    stats: Counter | None = None
+) -> Iterator[tuple[Path, str]]:
     """
-    Find all MP4 files matching the YYYYMMDD_TIME pattern.
+    Stream matching videos that have no output yet, in a single pass.
+    
+    The output folder is listed once, and each discovered filename is matched
+    and checked exactly once.
     
     Args:
         search_folder: Folder to search recursively
+        output_folder: Folder where processed videos are saved
+        stats: Optional counter updated with "scanned" and "already_processed"
         
-    Returns:
-        List of matching video file paths
+    Yields:
+        Tuples of (video_path, output_filename) for files that need processing
     """
-    matching_files = []
-    
-    logger.info(f"Searching for Sora shorts in: {search_folder}")
-    
-    # Search recursively for all MP4 files
-    for mp4_file in search_folder.rglob("*.mp4"):
-        if PATTERN.match(mp4_file.name):
-            matching_files.append(mp4_file)
-    
-    logger.info(f"Found {len(matching_files)} matching Sora short(s)")
-    return matching_files
+    if stats is None:
+        stats = Counter()
+    
+    existing = {entry.name for entry in os.scandir(output_folder)} if output_folder.exists() else set()
+    
+    for entry, output_filename in _scandir_mp4(os.fspath(search_folder)):
+        stats["scanned"] += 1
+        if output_filename in existing:
+            stats["already_processed"] += 1
+            logger.debug(f"Skipping already processed: {entry.name}")
+            continue
+        yield Path(entry.path), output_filename
 
 
-def filter_unprocessed(files: List[Path], output_folder: Path) -> List[Path]:
-    """
-    Filter out files that have already been processed.
-    
-    Args:
-        files: List of input video files
-        output_folder: Folder where processed videos are saved
-        
-    Returns:
-        List of files that need processing
-    """
-    unprocessed = []
-    
-    for video_file in files:
-        output_filename = generate_output_filename(video_file.name)
-        output_path = output_folder / output_filename
-        
-        if not output_path.exists():
-            unprocessed.append(video_file)
-        else:
-            logger.debug(f"Skipping already processed: {video_file.name}")
-    
-    return unprocessed
+def default_worker_count() -> int:
+    """Number of worker processes to use, leaving each ffmpeg a few cores."""
+    return max(1, (os.cpu_count() or 1) // FFMPEG_THREADS_PER_WORKER)
+
+
+# Per-worker SoraWM instance, created once by _init_worker
+_WM: SoraWM | None = None
+
+
+def _init_worker() -> None:
+    """Load the model once per worker process."""
+    global _WM
+    _WM = SoraWM()
+
+
+def _process_one(video_file: Path, output_path: Path) -> None:
+    """Process a single video in a worker process."""
+    _WM.run(video_file, output_path)
 
 
 def process_videos(
-    input_files: List[Path],
+    input_files: List[tuple[Path, str]],
     output_folder: Path,
-    sora_wm: SoraWM
+    sora_wm: SoraWM | None = None,
+    max_workers: int | None = None
 ) -> tuple[int, int]:
     """
     Process all video files.
     
+    Clips are independent, so with more than one worker they are processed
+    concurrently in separate processes. Each worker loads the model once and
+    reuses it for every clip it handles.
+    
     Args:
-        input_files: List of video files to process
+        input_files: List of (video_path, output_filename) tuples to process
         output_folder: Folder to save processed videos
-        sora_wm: SoraWM instance
+        sora_wm: SoraWM instance used when processing sequentially
+        max_workers: Number of worker processes (default: default_worker_count())
         
     Returns:
         Tuple of (successful_count, failed_count)
@@ -136,52 +157,95 @@ def process_videos(
         logger.info("No files to process!")
         return 0, 0
     
-    logger.info(f"Processing {len(input_files)} video(s)...")
+    workers = min(max_workers or default_worker_count(), len(input_files))
+    logger.info(f"Processing {len(input_files)} video(s) with {workers} worker(s)...")
     
-    for video_file in tqdm(input_files, desc="Processing videos"):
-        try:
-            output_filename = generate_output_filename(video_file.name)
-            output_path = output_folder / output_filename
-            
-            logger.info(f"Processing: {video_file.name} -> {output_filename}")
-            
-            # Process the video
-            sora_wm.run(video_file, output_path)
-            
-            logger.success(f"✓ Successfully processed: {output_filename}")
-            successful += 1
-            
-        except Exception as e:
-            logger.error(f"✗ Error processing {video_file.name}: {e}")
-            failed += 1
+    if workers <= 1:
+        if sora_wm is None:
+            sora_wm = SoraWM()
+        
+        # Let tqdm own stderr; only failures are logged per file
+        for video_file, output_filename in tqdm(input_files, desc="Processing videos", mininterval=0.5):
+            try:
+                output_path = output_folder / output_filename
+                
+                # Process the video
+                sora_wm.run(video_file, output_path)
+                
+                successful += 1
+                
+            except Exception as e:
+                logger.error(f"✗ Error processing {video_file.name}: {e}")
+                failed += 1
+        
+        return successful, failed
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {}
+        for video_file, output_filename in input_files:
+            future = executor.submit(_process_one, video_file, output_folder / output_filename)
+            futures[future] = (video_file, output_filename)
+        
+        with tqdm(total=len(futures), desc="Processing videos", mininterval=0.5) as progress:
+            for future in as_completed(futures):
+                video_file, output_filename = futures[future]
+                try:
+                    future.result()
+                    successful += 1
+                except BrokenProcessPool:
+                    # Every remaining future fails the same way; report it once
+                    if successful == 0:
+                        logger.error("Failed to initialize watermark remover in worker processes")
+                    else:
+                        logger.error("A worker process exited unexpectedly; stopping")
+                    failed = len(futures) - successful
+                    break
+                except Exception as e:
+                    logger.error(f"✗ Error processing {video_file.name}: {e}")
+                    failed += 1
+                progress.update(1)
     
     return successful, failed
 
 
-def main():
+def main(argv: List[str] | None = None):
     """Main function."""
-    # Configuration - matches watcher.py paths
-    input_folder = Path("/Users/blakeyoung/Library/Mobile Documents/com~apple~CloudDocs/Big Downloads")
-    output_folder = Path("/Users/blakeyoung/Library/Mobile Documents/com~apple~CloudDocs/Streaming/Removed Watermark")
+    global _log_sink_id
     
-    # Allow override via command line arguments
-    if len(sys.argv) > 1:
-        input_folder = Path(sys.argv[1])
-    if len(sys.argv) > 2:
-        output_folder = Path(sys.argv[2])
+    # Configuration - matches watcher.py paths
+    parser = argparse.ArgumentParser(description="Batch process Sora shorts in YYYYMMDD_TIME format.")
+    parser.add_argument(
+        "input_folder",
+        nargs="?",
+        type=Path,
+        default=Path("/Users/blakeyoung/Library/Mobile Documents/com~apple~CloudDocs/Big Downloads")
+    )
+    parser.add_argument(
+        "output_folder",
+        nargs="?",
+        type=Path,
+        default=Path("/Users/blakeyoung/Library/Mobile Documents/com~apple~CloudDocs/Streaming/Removed Watermark")
+    )
+    parser.add_argument("-y", "--yes", action="store_true", help="Process without asking for confirmation")
+    args = parser.parse_args(argv)
+    input_folder = args.input_folder
+    output_folder = args.output_folder
     
     # Validate input folder
     if not input_folder.exists():
         logger.error(f"Input folder does not exist: {input_folder}")
-        logger.info("Usage: python process_sora_shorts.py [input_folder] [output_folder]")
+        logger.info("Usage: python process_sora_shorts.py [input_folder] [output_folder] [--yes]")
         return 1
     
-    # Set up logging
-    logger.add(
+    # Set up logging (file writes happen on loguru's background thread)
+    if _log_sink_id is not None:
+        logger.remove(_log_sink_id)
+    _log_sink_id = logger.add(
         output_folder / "process_sora_shorts.log",
         rotation="10 MB",
         retention="7 days",
-        level="INFO"
+        level="INFO",
+        enqueue=True
     )
     
     logger.info("=" * 60)
@@ -190,54 +254,57 @@ def main():
     logger.info(f"Input folder: {input_folder}")
     logger.info(f"Output folder: {output_folder}")
     
-    # Initialize SoraWM
-    logger.info("Initializing watermark remover...")
-    try:
-        sora_wm = SoraWM()
-        logger.info("✓ Watermark remover initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize watermark remover: {e}")
-        return 1
-    
-    # Find all matching files
-    all_files = find_sora_shorts(input_folder)
+    # Find matching files that still need processing, listing each as it is found
+    logger.info(f"Searching for Sora shorts in: {input_folder}")
+    logger.info("\nFiles to process:")
+    stats = Counter()
+    unprocessed = []
+    for video_file, output_filename in iter_unprocessed(input_folder, output_folder, stats):
+        unprocessed.append((video_file, output_filename))
+        logger.info(f"  {len(unprocessed)}. {video_file.name} -> {output_filename}")
     
-    if not all_files:
+    if not stats["scanned"]:
         logger.warning("No matching Sora shorts found!")
         return 0
     
-    # Filter out already processed files
-    unprocessed_files = filter_unprocessed(all_files, output_folder)
+    logger.info(f"Found {stats['scanned']} matching Sora short(s)")
+    if stats["already_processed"] > 0:
+        logger.info(f"Found {stats['already_processed']} already processed file(s)")
     
-    already_processed_count = len(all_files) - len(unprocessed_files)
-    if already_processed_count > 0:
-        logger.info(f"Found {already_processed_count} already processed file(s)")
-    
-    if not unprocessed_files:
+    if not unprocessed:
         logger.info("All files have already been processed!")
         return 0
     
-    logger.info(f"Found {len(unprocessed_files)} file(s) to process")
+    logger.info(f"Found {len(unprocessed)} file(s) to process")
     
-    # Show list of files to be processed
-    logger.info("\nFiles to process:")
-    for i, video_file in enumerate(unprocessed_files, 1):
-        output_filename = generate_output_filename(video_file.name)
-        logger.info(f"  {i}. {video_file.name} -> {output_filename}")
-    
-    # Ask for confirmation (optional - you can remove this if you want it to run automatically)
-    try:
-        response = input(f"\nProcess {len(unprocessed_files)} video(s)? [y/N]: ").strip().lower()
-        if response not in ['y', 'yes']:
-            logger.info("Cancelled by user")
+    # Ask for confirmation before loading the model (skip with --yes)
+    if not args.yes:
+        try:
+            response = input(f"\nProcess {len(unprocessed)} video(s)? [y/N]: ").strip().lower()
+            if response not in ['y', 'yes']:
+                logger.info("Cancelled by user")
+                return 0
+        except KeyboardInterrupt:
+            logger.info("\nCancelled by user")
             return 0
-    except KeyboardInterrupt:
-        logger.info("\nCancelled by user")
-        return 0
+    
+    # Initialize SoraWM (worker processes load their own when running in parallel)
+    workers = min(default_worker_count(), len(unprocessed))
+    sora_wm = None
+    if workers == 1:
+        logger.info("Initializing watermark remover...")
+        try:
+            sora_wm = SoraWM()
+            logger.info("✓ Watermark remover initialized")
+        except Exception as e:
+            logger.error(f"Failed to initialize watermark remover: {e}")
+            return 1
+    else:
+        logger.info(f"Using up to {workers} worker processes")
     
     # Process videos
     logger.info("\nStarting processing...")
-    successful, failed = process_videos(unprocessed_files, output_folder, sora_wm)
+    successful, failed = process_videos(unprocessed, output_folder, sora_wm, workers)
     
     # Summary
     logger.info("\n" + "=" * 60)
@@ -6,23 +6,21 @@ import re
 from pathlib import Path
 
 # Python 3.13 compatibility shim for imghdr
-if sys.version_info >= (3, 13):
+if sys.version_info >= (3, 13) and 'imghdr' not in sys.modules:
     try:
-        import imghdr_compat
+        import imghdr_compat  # noqa: F401
     except ImportError:
         pass
 
 from sorawm.core import SoraWM
 
+# Pattern: YYYYMMDD_TIME_*.mp4
+_PATTERN = re.compile(r'^(\d{8})_(\d+)_')
+
 def extract_prefix(filename: str) -> str | None:
     """Extract prefix up to second underscore."""
-    pattern = re.compile(r'^(\d{8})_(\d+)_')
-    match = pattern.match(filename)
-    if match:
-        year_month_day = match.group(1)
-        time_part = match.group(2)
-        return f"{year_month_day}_{time_part}"
-    return None
+    m = _PATTERN.match(filename)
+    return f"{m[1]}_{m[2]}" if m else None
 
 def generate_output_filename(input_filename: str) -> str:
     """Generate output filename with wr_ prefix."""
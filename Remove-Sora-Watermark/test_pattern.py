@@ -8,12 +8,8 @@ pattern = re.compile(r'^(\d{8})_(\d+)_')
 
 def extract_prefix(filename: str) -> str | None:
     """Extract prefix up to second underscore."""
-    match = pattern.match(filename)
-    if match:
-        year_month_day = match.group(1)
-        time_part = match.group(2)
-        return f"{year_month_day}_{time_part}"
-    return None
+    m = pattern.match(filename)
+    return f"{m[1]}_{m[2]}" if m else None
 
 def generate_output_filename(input_filename: str) -> str:
     """Generate output filename with wr_ prefix."""
@@ -6,31 +6,272 @@ YYYYMMDD_TIME_*.mp4 and automatically processes them.
 """
 
 import os
-import re
+import sqlite3
 import subprocess
 import sys
 import time
 import json
+import multiprocessing
+import queue
+import shutil
+import signal
+import stat
 import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Set
+from typing import Dict, List, Set
 
 # Set PATH to include Homebrew binaries (needed for ffmpeg/ffprobe)
 os.environ['PATH'] = '/opt/homebrew/bin:/usr/local/bin:' + os.environ.get('PATH', '')
 
 # Python 3.13 compatibility shim for imghdr
-if sys.version_info >= (3, 13):
+if sys.version_info >= (3, 13) and 'imghdr' not in sys.modules:
     try:
-        import imghdr_compat
+        import imghdr_compat  # noqa: F401
     except ImportError:
         pass
 
 from loguru import logger
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.observers.polling import PollingObserver
+from watchdog.events import EVENT_TYPE_CREATED, EVENT_TYPE_MOVED, FileSystemEventHandler
 
 from sorawm.core import SoraWM
 
+# Periodic check waits this long between passes, doubling after each pass that finds
+# nothing up to the cap; a processing error wakes it immediately and resets the interval
+PERIODIC_CHECK_MIN_INTERVAL = 30
+PERIODIC_CHECK_MAX_INTERVAL = 15 * 60
+# Periodic check re-scans the input folder from disk at most this often (seconds)
+RESCAN_INTERVAL = 5 * 60
+
+# Kill a SoraWM job (and its ffmpeg) that runs longer than this many seconds
+SORAWM_TIMEOUT = float(os.environ.get("SORAWM_TIMEOUT", str(15 * 60)))
+# Videos processed at once; each one gets its own worker process and model copy
+SORAWM_CONCURRENCY = max(1, int(os.environ.get("SORAWM_CONCURRENCY", "2")))
+
+# Minimum seconds between progress file writes (intermediate updates are coalesced)
+PROGRESS_WRITE_INTERVAL = 0.25
+
+# st_flags bit macOS sets on dataless (not yet downloaded) iCloud files
+SF_DATALESS = getattr(stat, "SF_DATALESS", 0x40000000)
+# iCloud command-line tool used to request downloads (macOS only)
+BRCTL = shutil.which("brctl")
+# Ask iCloud again for a placeholder still not downloaded after this many seconds
+ICLOUD_DOWNLOAD_RETRY_INTERVAL = 10 * 60
+
+# A new file is considered fully written once its size and mtime are unchanged (and non-zero) over one interval
+STABILITY_INTERVAL = 1.5
+# Repeated events for the same path within this many seconds are dropped (iCloud and
+# atomic saves often fire created+moved or several events for one file)
+EVENT_DEBOUNCE_SECONDS = 5.0
+# Number of recently seen paths remembered for debouncing
+EVENT_DEBOUNCE_MAX_PATHS = 512
+
+# Files renamed into the folder are usually complete already, so they only get a quick re-check
+MOVED_STABILITY_INTERVAL = 0.1
+# Give up on a file still growing after this many checks (the periodic check retries it later)
+MAX_STABILITY_CHECKS = 20
+
+
+def _fast_prefix_reject(name: str) -> bool:
+    """
+    Cheap check that rules out names which cannot match YYYYMMDD_TIME_*.
+    
+    Lets iCloud metadata, .DS_Store and temp files skip the regex entirely.
+    
+    Args:
+        name: File name to check
+        
+    Returns:
+        True if the name definitely doesn't match the pattern
+    """
+    return len(name) < 10 or not name[:8].isdigit() or name[8] != '_'
+
+
+@lru_cache(maxsize=8192)
+def extract_filename_prefix(filename: str) -> str | None:
+    """
+    Extract the prefix up to the second underscore for renaming.
+    
+    Example: '20251104_1209_01k97zny35f599pp7dpv6tk1wc.mp4' -> '20251104_1209'
+    
+    Names must look like YYYYMMDD_TIME_* (8 ASCII digits, underscore, one or
+    more ASCII digits, underscore). Checked with plain string operations rather
+    than a regex, since this runs for every file system event and scanned file.
+    
+    Args:
+        filename: The input filename
+        
+    Returns:
+        Prefix string up to second underscore, or None if pattern doesn't match
+    """
+    if _fast_prefix_reject(filename):
+        return None
+    end = filename.find('_', 9)
+    prefix = filename[:end]
+    if end <= 9 or not prefix.isascii() or not prefix[9:].isdigit() or not prefix[:8].isdigit():
+        return None
+    return prefix
+
+
+@lru_cache(maxsize=8192)
+def _is_target(name: str) -> str | None:
+    """
+    Check a file name for both the .mp4 suffix and the YYYYMMDD_TIME_ prefix.
+    
+    Args:
+        name: File name (basename) to check
+        
+    Returns:
+        The YYYYMMDD_TIME prefix if the file should be processed, otherwise None
+    """
+    if name[-4:].lower() != '.mp4':
+        return None
+    return extract_filename_prefix(name)
+
+
+@lru_cache(maxsize=8192)
+def generate_output_filename(input_filename: str) -> str:
+    """
+    Generate output filename with wr_ prefix.
+    
+    Args:
+        input_filename: Original filename
+        
+    Returns:
+        New filename: wr_YYYYMMDD_TIME.mp4
+    """
+    prefix = extract_filename_prefix(input_filename)
+    if prefix:
+        return f"wr_{prefix}.mp4"
+    # Fallback: add wr_ prefix to original name
+    return f"wr_{input_filename}"
+
+
+def filename_timestamp(filename: str) -> int:
+    """
+    Download time encoded in the filename, for picking the newest file.
+    
+    Args:
+        filename: The input filename
+        
+    Returns:
+        YYYYMMDDHHMM as an integer, or 0 if the pattern doesn't match
+    """
+    prefix = extract_filename_prefix(filename)
+    if prefix:
+        return int(prefix[:8] + prefix[9:])
+    return 0
+
+
+def is_icloud_placeholder(file_path: Path, st: os.stat_result | None = None) -> bool:
+    """
+    Whether a file is an iCloud placeholder whose contents aren't on disk yet.
+    
+    Checks the dataless flag on the file's stat result (current macOS) and the
+    hidden '.<name>.icloud' stub that older macOS versions leave instead.
+    
+    Args:
+        file_path: Path to the video file
+        st: The file's stat result, if the caller already has one
+        
+    Returns:
+        True if the file still needs to be downloaded from iCloud
+    """
+    if st is not None and getattr(st, "st_flags", 0) & SF_DATALESS:
+        return True
+    return (file_path.parent / f".{file_path.name}.icloud").exists()
+
+
+def is_locked_for_writing(file_path: Path) -> bool:
+    """
+    Whether another process holds an exclusive lock on the file (macOS O_EXLOCK).
+    
+    Always False where O_EXLOCK isn't available; the size check still applies there.
+    
+    Args:
+        file_path: Path to the video file
+        
+    Returns:
+        True if a writer still has the file locked
+    """
+    if not hasattr(os, "O_EXLOCK"):
+        return False
+    try:
+        fd = os.open(file_path, os.O_RDONLY | os.O_EXLOCK | os.O_NONBLOCK)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    os.close(fd)
+    return False
+
+
+def watched_folders(input_folder: Path) -> List[Path]:
+    """
+    Folders to poll: the input folder and its immediate, non-hidden subfolders.
+    
+    Args:
+        input_folder: Root folder being monitored
+        
+    Returns:
+        List of folders to schedule non-recursive watches on
+    """
+    folders = [input_folder]
+    try:
+        with os.scandir(input_folder) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                    folders.append(Path(entry.path))
+    except OSError as e:
+        logger.warning(f"Could not list subfolders of {input_folder}: {e}")
+    return folders
+
+
+# Long-lived `osascript -i` interpreter shared by all notifications (started on first use)
+_osa_proc: subprocess.Popen | None = None
+_osa_lock = threading.Lock()
+
+
+def _send_via_persistent_osascript(script: str) -> bool:
+    """
+    Run an AppleScript line on the persistent osascript interpreter.
+    
+    Avoids a fork/exec and interpreter start-up per notification. The
+    interpreter is restarted once if its pipe is broken.
+    
+    Args:
+        script: Single-line AppleScript to execute
+        
+    Returns:
+        True if the script was handed to the interpreter, False to fall back
+    """
+    global _osa_proc
+    with _osa_lock:
+        for _ in range(2):
+            if _osa_proc is None or _osa_proc.poll() is not None:
+                try:
+                    _osa_proc = subprocess.Popen(
+                        ["osascript", "-i"],
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        text=True
+                    )
+                except OSError:
+                    _osa_proc = None
+                    return False
+            try:
+                _osa_proc.stdin.write(script + "\n")
+                _osa_proc.stdin.flush()
+                return True
+            except (BrokenPipeError, OSError):
+                _osa_proc = None
+    return False
+
 
 def send_macos_notification(title: str, message: str, subtitle: str = ""):
     """
@@ -53,6 +294,11 @@ def send_macos_notification(title: str, message: str, subtitle: str = ""):
         else:
             script = f'display notification "{message_escaped}" with title "{title_escaped}"'
         
+        # Prefer the warm interpreter; spawn a one-off osascript if it isn't available
+        if _send_via_persistent_osascript(script):
+            logger.debug(f"Notification sent: {title} - {message}")
+            return
+        
         # Execute osascript
         result = subprocess.run(
             ["osascript", "-e", script],
@@ -71,6 +317,169 @@ def send_macos_notification(title: str, message: str, subtitle: str = ""):
         logger.error(f"Failed to send notification: {e}")
 
 
+def _exit_with_parent():
+    """Child-side watchdog: kill this worker (and its ffmpeg) as soon as the watcher is gone."""
+    # Returns when the parent exits for any reason, including SIGKILL
+    multiprocessing.parent_process().join()
+    if hasattr(os, "killpg"):
+        os.killpg(0, signal.SIGKILL)
+    os._exit(1)
+
+
+def _sorawm_worker_main(jobs, results):
+    """
+    Child process loop: load SoraWM once, then run jobs until told to stop.
+    
+    Args:
+        jobs: Queue of (input_path, output_path) tuples; None stops the worker
+        results: Queue receiving ("ready" | "progress" | "done" | "error" | "log", value) messages
+    """
+    if hasattr(os, "setpgrp"):
+        # Own process group, so a timeout kill also takes down ffmpeg
+        os.setpgrp()
+    # Being in its own group, the worker isn't stopped along with the watcher; it has to notice itself
+    threading.Thread(target=_exit_with_parent, daemon=True).start()
+    # Hand SoraWM's log messages to the watcher, which writes them to its own sinks (watcher.log)
+    logger.remove()
+    logger.add(
+        lambda message: results.put(("log", (message.record["level"].name, message.record["message"]))),
+        level="DEBUG",
+        format="{message}"
+    )
+    try:
+        sora_wm = SoraWM()
+    except Exception as e:
+        results.put(("error", f"Failed to initialize SoraWM: {e}"))
+        return
+    results.put(("ready", None))
+    
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        input_path, output_path = job
+        try:
+            sora_wm.run(input_path, output_path, progress_callback=lambda p: results.put(("progress", p)))
+            results.put(("done", None))
+        except Exception as e:
+            results.put(("error", str(e)))
+
+
+class SoraWMWorker:
+    """
+    Runs SoraWM in a persistent child process so a stuck job can be killed.
+    
+    The child process (and the model) is only started by the first job, so an
+    idle watcher holds no model memory. The model is then loaded once and reused
+    for every job. A job that exceeds the timeout is killed along with its
+    ffmpeg, and a fresh worker is started for the next job.
+    """
+    
+    def __init__(self, timeout: float = SORAWM_TIMEOUT):
+        """
+        Set up the worker; the process itself starts on the first run().
+        
+        Args:
+            timeout: Wall-clock limit in seconds for a single job
+        """
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._proc = None
+    
+    def _start(self):
+        """Spawn a fresh worker process with its own queues."""
+        self._jobs = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._ready = False
+        self._proc = self._ctx.Process(
+            target=_sorawm_worker_main,
+            args=(self._jobs, self._results),
+            name="sorawm-worker",
+            daemon=True
+        )
+        self._proc.start()
+    
+    def kill(self):
+        """Kill the worker and everything it spawned; a run() in progress then fails with RuntimeError."""
+        proc = self._proc
+        if proc is None:
+            return
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+    
+    def _kill(self):
+        """Kill the worker and wait for it to exit."""
+        self.kill()
+        self._proc.join(5)
+        self._proc = None
+    
+    def run(self, input_path: Path, output_path: Path, progress_callback=None):
+        """
+        Process one video in the worker, enforcing the timeout.
+        
+        Args:
+            input_path: Video to process
+            output_path: Where to write the result
+            progress_callback: Called with progress updates (0-100)
+            
+        Raises:
+            TimeoutError: If the job ran longer than the timeout (the worker is killed)
+            RuntimeError: If SoraWM failed or the worker died
+        """
+        if self._proc is None or not self._proc.is_alive():
+            self._start()
+        self._jobs.put((input_path, output_path))
+        
+        # Model loading doesn't count against the job's time limit
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._kill()
+                raise TimeoutError(f"SoraWM did not finish within {self.timeout:.0f}s, worker killed")
+            try:
+                kind, value = self._results.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                if not self._proc.is_alive():
+                    exitcode = self._proc.exitcode
+                    self._proc = None
+                    raise RuntimeError(f"SoraWM worker exited unexpectedly (code {exitcode})")
+                continue
+            
+            if kind == "ready":
+                self._ready = True
+                deadline = time.monotonic() + self.timeout
+            elif kind == "progress":
+                if progress_callback:
+                    progress_callback(value)
+            elif kind == "log":
+                level, message = value
+                logger.log(level, f"[SoraWM] {message}")
+            elif kind == "done":
+                return
+            elif kind == "error":
+                if not self._ready:
+                    # Initialization failed; the child has exited
+                    self._proc.join(5)
+                    self._proc = None
+                raise RuntimeError(value)
+    
+    def close(self):
+        """Ask the worker to exit, killing it if it doesn't."""
+        if self._proc is None:
+            return
+        self._jobs.put(None)
+        self._proc.join(5)
+        if self._proc.is_alive():
+            self._kill()
+        self._proc = None
+
+
 class VideoProcessor(FileSystemEventHandler):
     """Handler for file system events that processes matching MP4 files."""
     
@@ -85,151 +494,515 @@ class VideoProcessor(FileSystemEventHandler):
         self.input_folder = Path(input_folder)
         self.output_folder = Path(output_folder)
         self.output_folder.mkdir(parents=True, exist_ok=True)
+        # Resolved once; resolve() walks every path component (slow on iCloud Drive)
+        self._input_resolved_prefix = str(self.input_folder.resolve()) + os.sep
         self.processed_files: Set[str] = set()
-        self.sora_wm = SoraWM()
+        # SoraWM runs in child processes so a hung job can be killed (see SORAWM_TIMEOUT);
+        # a job borrows an idle worker from this pool for its duration
+        self._workers: "queue.Queue[SoraWMWorker]" = queue.Queue()
+        # Every worker, borrowed or idle, so abort() can reach running jobs
+        self._all_workers = [SoraWMWorker() for _ in range(SORAWM_CONCURRENCY)]
+        for worker in self._all_workers:
+            self._workers.put(worker)
+        
+        # Guards _index, _in_flight, processed_files and the tracking DB (shared by the observer, stabilizer, worker and periodic check threads)
+        self._lock = threading.Lock()
         
-        # Pattern: YYYYMMDD_TIME_*.mp4 (8 digits, underscore, time, underscore, anything, .mp4)
-        self.pattern = re.compile(r'^(\d{8})_(\d+)_')
+        # Progress of running jobs {filename: percent}, oldest first; all of them share
+        # one progress file, whose writes are throttled (see _write_progress)
+        self._progress_lock = threading.Lock()
+        self._progress_jobs: Dict[str, int] = {}
+        self._last_progress_ts = 0.0
+        self._progress_timer: threading.Timer | None = None
         
-        # Persistent tracking file to remember processed files across restarts
+        # Wakes the periodic check early (set at startup and when processing fails)
+        self._recheck = threading.Event()
+        self._recheck.set()
+        # Failed paths {path: monotonic time}: the periodic check won't retry them before then
+        self._retry_after: Dict[str, float] = {}
+        
+        # Persistent tracking DB to remember processed files across restarts;
+        # processed_files is kept as an in-memory cache of its paths. mtime and size
+        # record which content was processed, so a new file at the same path isn't skipped
+        self.tracking_db = self.output_folder / ".processed.sqlite"
+        self._db = sqlite3.connect(str(self.tracking_db), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS processed (path TEXT PRIMARY KEY, mtime REAL, output TEXT, size INTEGER)"
+        )
+        if "size" not in {row[1] for row in self._db.execute("PRAGMA table_info(processed)")}:
+            self._db.execute("ALTER TABLE processed ADD COLUMN size INTEGER")
+        self._db.commit()
+        # Older versions tracked processed files in an append-only text file
         self.tracking_file = self.output_folder / ".processed_files.txt"
         self._load_processed_files()
         
+        # In-memory index of matching MP4s {path: mtime}: built by one scan here, kept
+        # current by file system events, and reconciled against disk by rescan_index()
+        self._index: Dict[str, float | None] = self._scan_input_folder()
+        # Names of outputs (wr_*) in the output folder: listed once here, added to as videos
+        # finish, and re-listed by rescan_index(), so checks never stat the output folder
+        self._output_names: Set[str] = self._scan_output_folder()
+        
         logger.info(f"Watching folder: {self.input_folder}")
         logger.info(f"Output folder: {self.output_folder}")
         logger.info(f"Loaded {len(self.processed_files)} previously processed files")
+        logger.info(f"Indexed {len(self._index)} matching files in input folder")
+        
+        # Up to SORAWM_CONCURRENCY videos are processed at once on these threads (FIFO),
+        # never on the observer or check threads
+        self._executor = ThreadPoolExecutor(max_workers=SORAWM_CONCURRENCY, thread_name_prefix="sorawm")
+        # iCloud placeholders we've asked brctl to download {path: monotonic time of the request}
+        self._download_requested: Dict[str, float] = {}
+        # Paths queued on or running in the executor, so the periodic check leaves them alone
+        self._in_flight: Set[str] = set()
+        # Set by close(); later submissions from the stabilizer or periodic check are dropped
+        self._closed = False
+        
+        # Notifications are sent from a background thread so a slow osascript never delays processing
+        self._notifications: "queue.Queue[tuple[str, str, str]]" = queue.Queue()
+        threading.Thread(target=self._notification_loop, daemon=True).start()
+        
+        # Recently queued paths {path: monotonic time}, oldest first, for dropping duplicate events
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        
+        # New files wait here until their size stops changing, so event handlers never sleep
+        self._pending: "queue.Queue[tuple[Path, str, int, float]]" = queue.Queue()
+        threading.Thread(target=self._stabilizer_loop, daemon=True).start()
     
-    def _load_processed_files(self):
-        """Load previously processed files from tracking file."""
-        if self.tracking_file.exists():
+    def _scan_input_folder(self) -> Dict[str, float | None]:
+        """
+        Scan the input folder (recursively) for matching MP4s.
+        
+        Files already in the tracking DB are indexed without a stat (mtime None),
+        so a restart over a mostly processed library costs one listing per folder
+        plus one stat per unprocessed file.
+        
+        Returns:
+            Dict mapping each matching file path to its mtime (None if already processed)
+        """
+        with self._lock:
+            done = frozenset(self.processed_files)
+        index = {}
+        folders = [str(self.input_folder)]
+        while folders:
             try:
-                with open(self.tracking_file, 'r') as f:
-                    for line in f:
-                        file_path = line.strip()
-                        if file_path:
-                            self.processed_files.add(file_path)
-                logger.info(f"Loaded {len(self.processed_files)} processed files from tracking")
-            except Exception as e:
-                logger.warning(f"Failed to load processed files tracking: {e}")
+                with os.scandir(folders.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            folders.append(entry.path)
+                        elif entry.name.endswith('.mp4') and extract_filename_prefix(entry.name):
+                            if entry.path in done:
+                                index[entry.path] = None
+                                continue
+                            try:
+                                index[entry.path] = entry.stat().st_mtime
+                            except OSError:
+                                continue  # Removed between listing and stat
+            except OSError as e:
+                logger.debug(f"Skipping unreadable folder: {e}")
+        return index
+    
+    def rescan_index(self):
+        """Reconcile the in-memory index with what is actually on disk."""
+        index = self._scan_input_folder()
+        output_names = self._scan_output_folder()
+        with self._lock:
+            self._index = index
+            self._output_names = output_names
+    
+    def _index_file(self, file_path: Path, mtime: float | None = None):
+        """Add or refresh a single file in the in-memory index (stats it unless mtime is given)."""
+        if mtime is None:
+            try:
+                mtime = file_path.stat().st_mtime
+            except OSError:
+                return
+        with self._lock:
+            self._index[str(file_path)] = mtime
+    
+    def forget_file(self, file_path: Path):
+        """Drop a file that no longer exists from the in-memory index."""
+        with self._lock:
+            self._index.pop(str(file_path), None)
+    
+    def indexed_files(self) -> List[Path]:
+        """Snapshot of indexed matching files."""
+        with self._lock:
+            return [Path(p) for p in self._index]
+    
+    def output_names(self) -> Set[str]:
+        """Snapshot of the names of processed outputs (wr_*) in the output folder."""
+        with self._lock:
+            return set(self._output_names)
+    
+    def _scan_output_folder(self) -> Set[str]:
+        """Names of processed outputs (wr_*) in the output folder, from one directory read."""
+        try:
+            with os.scandir(self.output_folder) as it:
+                return {entry.name for entry in it if entry.name.startswith('wr_')}
+        except OSError as e:
+            logger.warning(f"Could not list output folder: {e}")
+            return set()
+    
+    def _stabilizer_loop(self):
+        """Wait for queued files to stop growing, then process them."""
+        while True:
+            file_path, prefix, checks, interval = self._pending.get()
+            try:
+                # One stat per sample; size and mtime are both read from the same result
+                st1 = file_path.stat()
+                if is_icloud_placeholder(file_path, st1):
+                    # Nothing to wait for until iCloud downloads it; the periodic check retries it
+                    self._index_file(file_path, st1.st_mtime)
+                    self._defer_icloud_placeholder(file_path)
+                    continue
+                time.sleep(interval)
+                st2 = file_path.stat()
+            except OSError:
+                logger.error(f"❌ File disappeared: {file_path.name}")
+                continue
+            
+            # Empty files are usually a writer that hasn't started yet
+            if (st2.st_size != st1.st_size or st2.st_mtime != st1.st_mtime
+                    or st2.st_size == 0 or is_locked_for_writing(file_path)):
+                if checks + 1 < MAX_STABILITY_CHECKS:
+                    logger.debug(f"   File still being written ({st1.st_size} -> {st2.st_size} bytes): {file_path.name}")
+                    self._pending.put((file_path, prefix, checks + 1, STABILITY_INTERVAL))
+                else:
+                    logger.warning(f"⚠️ File still growing after {MAX_STABILITY_CHECKS} checks, leaving it for the periodic check: {file_path.name}")
+                    self._index_file(file_path, st2.st_mtime)
+                continue
+            
+            logger.opt(lazy=True).debug("✅ File size stable ({:.2f} MB), ready to process", lambda: st2.st_size / 1024 / 1024)
+            self._index_file(file_path, st2.st_mtime)
+            self.submit_video(file_path, prefix)
+    
+    def _notify(self, title: str, message: str, subtitle: str = ""):
+        """Queue a macOS notification; returns immediately."""
+        self._notifications.put((title, message, subtitle))
+    
+    def _notification_loop(self):
+        """Send queued notifications one at a time."""
+        while True:
+            title, message, subtitle = self._notifications.get()
+            send_macos_notification(title, message, subtitle)
+    
+    def _is_duplicate_event(self, file_path_str: str) -> bool:
+        """Whether an event for this path was already seen within EVENT_DEBOUNCE_SECONDS (records it if not)."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._recent.get(file_path_str)
+            if last is not None and now - last < EVENT_DEBOUNCE_SECONDS:
+                return True
+            self._recent[file_path_str] = now
+            self._recent.move_to_end(file_path_str)
+            while len(self._recent) > EVENT_DEBOUNCE_MAX_PATHS:
+                self._recent.popitem(last=False)
+        return False
+    
+    def _defer_icloud_placeholder(self, file_path: Path):
+        """Skip a file iCloud hasn't downloaded yet, asking iCloud to fetch it (again every ICLOUD_DOWNLOAD_RETRY_INTERVAL)."""
+        logger.debug(f"☁️ Not downloaded from iCloud yet, deferring: {file_path.name}")
+        file_path_str = str(file_path)
+        now = time.monotonic()
+        with self._lock:
+            # Let the periodic check move on to other files instead of picking this one every pass
+            self._retry_after[file_path_str] = now + PERIODIC_CHECK_MIN_INTERVAL
+            requested_at = self._download_requested.get(file_path_str)
+            if requested_at is not None and now - requested_at < ICLOUD_DOWNLOAD_RETRY_INTERVAL:
+                return
+            self._download_requested[file_path_str] = now
+        if BRCTL:
+            try:
+                subprocess.Popen([BRCTL, "download", file_path_str], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                logger.debug(f"Could not request iCloud download for {file_path.name}: {e}")
+    
+    def submit_video(self, file_path: Path, prefix: str | None = None) -> Future | None:
+        """Queue a video for processing on the executor (FIFO, SORAWM_CONCURRENCY at a time)."""
+        with self._lock:
+            if self._closed:
+                logger.debug(f"Shutting down, not queueing: {file_path.name}")
+                return None
+            logger.debug(f"🚀 Queued for watermark removal: {file_path.name}")
+            self._in_flight.add(str(file_path))
+            return self._executor.submit(self._run_video, file_path, prefix)
+    
+    def is_in_flight(self, file_path: Path) -> bool:
+        """Whether a video is queued or being processed right now."""
+        with self._lock:
+            return str(file_path) in self._in_flight
+    
+    def is_backing_off(self, file_path: Path) -> bool:
+        """Whether a video failed recently and shouldn't be retried yet."""
+        file_path_str = str(file_path)
+        with self._lock:
+            retry_at = self._retry_after.get(file_path_str)
+            if retry_at is None:
+                return False
+            if time.monotonic() < retry_at:
+                return True
+            del self._retry_after[file_path_str]
+            return False
     
-    def _save_processed_file(self, file_path: str):
-        """Save processed file to tracking file."""
+    def _run_video(self, file_path: Path, prefix: str | None = None):
+        """Worker-thread entry point; keeps one bad file from going unreported."""
         try:
-            with open(self.tracking_file, 'a') as f:
-                f.write(f"{file_path}\n")
+            self._process_video(file_path, prefix)
         except Exception as e:
-            logger.warning(f"Failed to save processed file to tracking: {e}")
+            logger.error(f"Unexpected error processing {file_path.name}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(str(file_path))
+    
+    def close(self):
+        """Stop taking new work, let running videos finish, then stop the workers and close the tracking DB."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        while not self._workers.empty():
+            self._workers.get_nowait().close()
+        with self._lock:
+            self._db.close()
+    
+    def abort(self):
+        """
+        Stop running videos now instead of letting them finish.
         
-    def _extract_filename_prefix(self, filename: str) -> str | None:
+        Queued videos are cancelled and running ones are killed; they fail like
+        any other error, so they are retried the next time the watcher runs.
+        A close() already waiting on them then returns.
+        """
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for worker in self._all_workers:
+            worker.kill()
+    
+    def _load_processed_files(self):
+        """Load previously processed files from the tracking DB."""
+        try:
+            self._migrate_tracking_file()
+            with self._lock:
+                self.processed_files.update(path for (path,) in self._db.execute("SELECT path FROM processed"))
+            logger.debug(f"Loaded {len(self.processed_files)} processed files from tracking")
+        except Exception as e:
+            logger.warning(f"Failed to load processed files tracking: {e}")
+    
+    def _migrate_tracking_file(self):
+        """Import the legacy .processed_files.txt into the tracking DB once."""
+        if not self.tracking_file.exists():
+            return
+        with open(self.tracking_file, 'r') as f:
+            paths = [(line.strip(),) for line in f if line.strip()]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO processed (path) VALUES (?)", paths)
+        self.tracking_file.rename(self.tracking_file.with_name(self.tracking_file.name + ".migrated"))
+        logger.info(f"Migrated {len(paths)} entries from {self.tracking_file.name} to {self.tracking_db.name}")
+    
+    def _save_processed_file(
+        self,
+        file_path: str,
+        output_filename: str | None = None,
+        st: os.stat_result | None = None
+    ):
+        """Save processed file to the tracking DB, with its mtime and size when known."""
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO processed (path, mtime, output, size) VALUES (?, ?, ?, ?)",
+                    (
+                        file_path,
+                        st.st_mtime if st else self._index.get(file_path),
+                        output_filename,
+                        st.st_size if st else None
+                    )
+                )
+        except Exception as e:
+            logger.warning(f"Failed to save processed file to tracking: {e}")
+    
+    def _is_processed(self, file_path: Path) -> bool:
         """
-        Extract the prefix up to the second underscore for renaming.
+        Whether this exact file has already been processed.
         
-        Example: '20251104_1209_01k97zny35f599pp7dpv6tk1wc.mp4' -> '20251104_1209'
+        A tracked path whose current mtime or size differs from what was recorded
+        is a new file saved under the same name (e.g. a re-download), so it is
+        untracked and reported as not processed.
         
         Args:
-            filename: The input filename
+            file_path: Path to the video file
             
         Returns:
-            Prefix string up to second underscore, or None if pattern doesn't match
+            True if the file is tracked and its content is unchanged
         """
-        match = self.pattern.match(filename)
-        if match:
-            year_month_day = match.group(1)
-            time_part = match.group(2)
-            return f"{year_month_day}_{time_part}"
-        return None
+        file_path_str = str(file_path)
+        if file_path_str not in self.processed_files:
+            return False
+        with self._lock:
+            row = self._db.execute(
+                "SELECT mtime, size FROM processed WHERE path = ?", (file_path_str,)
+            ).fetchone()
+        if row is None or row[0] is None or row[1] is None:
+            return True  # Tracked before sizes were recorded (or still being saved)
+        try:
+            st = file_path.stat()
+        except OSError:
+            return True
+        if (st.st_mtime, st.st_size) == tuple(row):
+            return True
+        logger.info(f"🔁 File changed since it was processed, will reprocess: {file_path.name}")
+        self._forget_processed_file(file_path_str)
+        return False
     
-    def _generate_output_filename(self, input_filename: str) -> str:
+    def _forget_processed_file(self, file_path: str):
+        """Remove a file from processed tracking so it can be retried."""
+        try:
+            with self._lock, self._db:
+                self.processed_files.discard(file_path)
+                self._db.execute("DELETE FROM processed WHERE path = ?", (file_path,))
+        except Exception as e:
+            logger.warning(f"Failed to remove processed file from tracking: {e}")
+        
+    def _write_progress(self, progress: int, filename: str):
         """
-        Generate output filename with wr_ prefix.
+        Write progress to a file that the dev server can read.
+        
+        Writes are limited to one per PROGRESS_WRITE_INTERVAL; updates arriving
+        faster are coalesced and the latest state is flushed by a timer. 0% and
+        100% are always written immediately.
         
         Args:
-            input_filename: Original filename
-            
-        Returns:
-            New filename: wr_YYYYMMDD_TIME.mp4
+            progress: Progress percentage (0-100)
+            filename: Name of the video being processed
         """
-        prefix = self._extract_filename_prefix(input_filename)
-        if prefix:
-            return f"wr_{prefix}.mp4"
-        # Fallback: add wr_ prefix to original name
-        return f"wr_{input_filename}"
-    
-    def _write_progress(self, progress: int, filename: str = None):
-        """Write progress to a file that the dev server can read"""
+        with self._progress_lock:
+            self._progress_jobs[filename] = progress
+            elapsed = time.monotonic() - self._last_progress_ts
+            if progress not in (0, 100) and elapsed < PROGRESS_WRITE_INTERVAL:
+                if self._progress_timer is None:
+                    self._progress_timer = threading.Timer(PROGRESS_WRITE_INTERVAL - elapsed, self._flush_progress)
+                    self._progress_timer.daemon = True
+                    self._progress_timer.start()
+                return
+            self._cancel_pending_progress()
+            self._dump_progress()
+    
+    def _flush_progress(self):
+        """Write the latest coalesced progress (runs on the throttle timer)."""
+        with self._progress_lock:
+            self._progress_timer = None
+            self._dump_progress()
+    
+    def _cancel_pending_progress(self):
+        """Drop a scheduled throttled write. Caller holds _progress_lock."""
+        if self._progress_timer is not None:
+            self._progress_timer.cancel()
+            self._progress_timer = None
+    
+    def _dump_progress(self):
+        """
+        Serialize progress of all running jobs to disk. Caller holds _progress_lock.
+        
+        The top-level fields describe the oldest running job, so a reader that
+        expects a single video sees a steady one; "jobs" lists every running video.
+        The file is removed once no jobs are left.
+        """
+        self._last_progress_ts = time.monotonic()
+        progress_file = self.output_folder / ".watermark_progress.json"
         try:
-            progress_file = self.output_folder / ".watermark_progress.json"
+            if not self._progress_jobs:
+                progress_file.unlink(missing_ok=True)
+                return
+            filename, progress = next(iter(self._progress_jobs.items()))
             progress_data = {
                 "progress": progress,
+                "filename": filename,
                 "timestamp": time.time(),
-                "is_processing": progress > 0 and progress < 100
+                "is_processing": progress > 0 and progress < 100,
+                "jobs": [
+                    {"filename": name, "progress": percent}
+                    for name, percent in self._progress_jobs.items()
+                ]
             }
-            if filename:
-                progress_data["filename"] = filename
-            with open(progress_file, 'w') as f:
+            # Write a temp file and rename it over the old one so readers never see a partial file
+            tmp_file = progress_file.with_suffix('.json.tmp')
+            with open(tmp_file, 'w') as f:
                 json.dump(progress_data, f)
+            os.replace(tmp_file, progress_file)
         except Exception as e:
             logger.debug(f"Could not write progress: {e}")
     
-    def _clear_progress(self):
-        """Clear progress file when done"""
-        try:
-            progress_file = self.output_folder / ".watermark_progress.json"
-            if progress_file.exists():
-                progress_file.unlink()
-        except Exception as e:
-            logger.debug(f"Could not clear progress: {e}")
+    def _clear_progress(self, filename: str):
+        """Drop a finished job from the progress file (removing the file if it was the last one)."""
+        with self._progress_lock:
+            self._progress_jobs.pop(filename, None)
+            # A late throttled write must not bring back the finished job
+            self._cancel_pending_progress()
+            self._dump_progress()
     
-    def _process_video(self, file_path: Path):
+    def _process_video(self, file_path: Path, prefix: str | None = None):
         """
         Process a video file to remove watermark.
         Simple: if file matches pattern and is new, process it.
         
         Args:
             file_path: Path to the video file to process
+            prefix: YYYYMMDD_TIME prefix if the caller already matched the name
         """
         file_path_str = str(file_path)
         
-        logger.info(f"🔍 _process_video() called for: {file_path.name}")
-        logger.info(f"   Full path: {file_path_str}")
-        logger.info(f"   Input folder: {self.input_folder}")
-        logger.info(f"   Output folder: {self.output_folder}")
-        
-        # Check if file matches pattern (YYYYMMDD_TIME_*.mp4)
-        pattern_match = self.pattern.match(file_path.name)
-        logger.info(f"   Pattern match result: {pattern_match}")
-        if not pattern_match:
-            logger.warning(f"⚠️ File doesn't match pattern: {file_path.name}")
-            logger.info(f"   Pattern: {self.pattern.pattern}")
+        logger.debug(f"🔍 _process_video() called for: {file_path.name}")
+        logger.debug(f"   Full path: {file_path_str}")
+        logger.debug(f"   Input folder: {self.input_folder}")
+        logger.debug(f"   Output folder: {self.output_folder}")
+        
+        # Check if file matches pattern (YYYYMMDD_TIME_*.mp4); the prefix also names the output
+        if prefix is None:
+            prefix = extract_filename_prefix(file_path.name)
+        logger.debug(f"   Pattern match result: {prefix}")
+        if not prefix:
+            logger.debug(f"⚠️ File doesn't match pattern: {file_path.name}")
+            logger.debug(f"   Expected pattern: YYYYMMDD_TIME_*.mp4")
             return
         
-        # Check if already processing/processed (prevent duplicates)
-        logger.info(f"   Checking processed files set (size: {len(self.processed_files)})")
-        if file_path_str in self.processed_files:
-            logger.warning(f"⚠️ File already processed, skipping: {file_path.name}")
+        # Don't hand SoraWM a file that iCloud hasn't downloaded yet
+        try:
+            st = file_path.stat()
+        except OSError:
+            st = None
+        if is_icloud_placeholder(file_path, st):
+            self._defer_icloud_placeholder(file_path)
             return
         
-        logger.info(f"✅ File is new and matches pattern, proceeding with processing")
+        # Check if already processing/processed (prevent duplicates)
+        logger.debug(f"   Checking processed files set (size: {len(self.processed_files)})")
+        with self._lock:
+            if file_path_str in self.processed_files:
+                logger.debug(f"⚠️ File already processed, skipping: {file_path.name}")
+                return
+            # Mark as processing NOW to prevent duplicate processing
+            self.processed_files.add(file_path_str)
         
-        # Mark as processing NOW to prevent duplicate processing
-        self.processed_files.add(file_path_str)
-        self._save_processed_file(file_path_str)
-        logger.info(f"✅ File marked as processing in tracking")
+        logger.debug(f"✅ File is new and matches pattern, proceeding with processing")
         
-        # Generate output filename
-        output_filename = self._generate_output_filename(file_path.name)
+        # Generate output filename from the prefix matched above
+        output_filename = f"wr_{prefix}.mp4"
         output_path = self.output_folder / output_filename
-        logger.info(f"   Output filename: {output_filename}")
-        logger.info(f"   Output path: {output_path}")
+        
+        self._save_processed_file(file_path_str, output_filename, st)
+        logger.debug(f"✅ File marked as processing in tracking")
+        logger.debug(f"   Output filename: {output_filename}")
+        logger.debug(f"   Output path: {output_path}")
         
         # Send notification
-        send_macos_notification(
+        self._notify(
             title="Watermark Remover",
             message=f"New video detected: {file_path.name}",
             subtitle="Starting watermark removal..."
         )
         logger.info(f"🆕 Processing NEW video: {file_path.name} -> {output_filename}")
-        logger.info(f"📊 Starting watermark removal process...")
+        logger.debug(f"📊 Starting watermark removal process...")
         
         try:
             # Write initial progress with filename
@@ -240,24 +1013,30 @@ class VideoProcessor(FileSystemEventHandler):
                 logger.debug(f"📊 Progress update: {progress}%")
                 self._write_progress(progress, file_path.name)
             
-            logger.info(f"🚀 Calling sora_wm.run() with progress callback...")
-            logger.info(f"   Input: {file_path}")
-            logger.info(f"   Output: {output_path}")
+            logger.debug(f"🚀 Calling sora_wm.run() with progress callback...")
+            logger.debug(f"   Input: {file_path}")
+            logger.debug(f"   Output: {output_path}")
             
             # Process the video with progress callback
-            self.sora_wm.run(file_path, output_path, progress_callback=progress_callback)
+            sora_wm = self._workers.get()
+            try:
+                sora_wm.run(file_path, output_path, progress_callback=progress_callback)
+            finally:
+                self._workers.put(sora_wm)
             logger.success(f"✅ Successfully processed: {file_path.name} -> {output_filename}")
+            with self._lock:
+                self._output_names.add(output_filename)
             
             # Clear progress when done
-            self._clear_progress()
-            logger.info(f"✅ Progress file cleared")
+            self._clear_progress(file_path.name)
+            logger.debug(f"✅ Progress file cleared")
             
             # KEEP original file in Big Downloads folder (user requested - for verification)
             # Previously deleted here, but keeping files so user can verify latest processing
-            logger.info(f"📁 Keeping original file in Big Downloads: {file_path.name}")
+            logger.debug(f"📁 Keeping original file in Big Downloads: {file_path.name}")
             
             # Send success notification
-            send_macos_notification(
+            self._notify(
                 title="Watermark Remover",
                 message=f"Watermark removed: {output_filename}",
                 subtitle="Processing complete"
@@ -265,137 +1044,87 @@ class VideoProcessor(FileSystemEventHandler):
         except Exception as e:
             logger.error(f"Error processing {file_path.name}: {e}")
             # Clear progress on error
-            self._clear_progress()
+            self._clear_progress(file_path.name)
             # Send error notification
-            send_macos_notification(
+            self._notify(
                 title="Watermark Remover",
                 message=f"Error processing: {file_path.name}",
                 subtitle=str(e)[:100]  # Truncate long error messages
             )
-            # Remove from processed_files so it can be retried
-            self.processed_files.discard(file_path_str)
-            # Remove from tracking file
-            try:
-                if self.tracking_file.exists():
-                    lines = []
-                    with open(self.tracking_file, 'r') as f:
-                        for line in f:
-                            if line.strip() != file_path_str:
-                                lines.append(line)
-                    with open(self.tracking_file, 'w') as f:
-                        f.writelines(lines)
-            except Exception:
-                pass  # Ignore tracking file errors
-    
-    def on_created(self, event):
-        """Called when a NEW file is created - only process NEW files, not existing ones."""
-        logger.info(f"📁 FILE CREATED EVENT: {event.src_path}")
+            # Remove from processed tracking so it can be retried, but not before the next
+            # regular check; waking the check now only resets its backoff to the minimum
+            self._forget_processed_file(file_path_str)
+            with self._lock:
+                self._retry_after[file_path_str] = time.monotonic() + PERIODIC_CHECK_MIN_INTERVAL
+            self._recheck.set()
+    
+    def dispatch(self, event):
+        """
+        Drop irrelevant events before any handler runs.
+        
+        Only file creations and moves whose resulting name is a target
+        (YYYYMMDD_TIME_*.mp4) reach on_created/on_moved, along with the prefix
+        matched here; everything else (modifications, deletions, directories,
+        .icloud stubs, .DS_Store, temp files) costs a couple of attribute reads
+        and one pass over the name.
         
+        Args:
+            event: The watchdog event
+        """
         if event.is_directory:
-            logger.debug(f"   Skipping directory: {event.src_path}")
             return
-        
-        file_path = Path(event.src_path)
-        logger.info(f"   File path: {file_path}")
-        logger.info(f"   File name: {file_path.name}")
-        logger.info(f"   File suffix: {file_path.suffix}")
-        
-        # Only process MP4 files
-        if file_path.suffix.lower() != '.mp4':
-            logger.debug(f"   Skipping non-MP4 file: {file_path.name}")
+        if event.event_type == EVENT_TYPE_CREATED:
+            path = event.src_path
+        elif event.event_type == EVENT_TYPE_MOVED:
+            path = event.dest_path
+        else:
             return
-        
-        logger.info(f"✅ MP4 file detected: {file_path.name}")
-        
-        # Check if file matches pattern (YYYYMMDD_TIME_*.mp4)
-        pattern_match = self.pattern.match(file_path.name)
-        logger.info(f"   Pattern check: {pattern_match}")
-        if not pattern_match:
-            logger.warning(f"⚠️ File doesn't match pattern (YYYYMMDD_TIME_*.mp4): {file_path.name}")
-            logger.info(f"   Expected pattern: YYYYMMDD_TIME_*.mp4")
-            logger.info(f"   Actual filename: {file_path.name}")
+        prefix = _is_target(os.path.basename(path))
+        if not prefix:
             return
+        if event.event_type == EVENT_TYPE_CREATED:
+            self.on_created(event, prefix)
+        else:
+            self.on_moved(event, prefix)
+    
+    def on_created(self, event, prefix: str):
+        """Called when a NEW file is created - only process NEW files, not existing ones."""
+        logger.debug(f"📁 FILE CREATED EVENT: {event.src_path}")
+        logger.debug(f"✅ Pattern matched: {prefix}")
+        file_path = Path(event.src_path)
         
-        logger.info(f"✅ Pattern matched!")
-        
-        # Check if already processed (prevent duplicates)
+        # Drop repeated events for the same path before any stat or DB lookup
         file_path_str = str(file_path)
-        logger.info(f"   Checking if already processed...")
-        logger.info(f"   Processed files count: {len(self.processed_files)}")
-        if file_path_str in self.processed_files:
-            logger.warning(f"⚠️ File already processed, skipping: {file_path.name}")
+        if self._is_duplicate_event(file_path_str):
+            logger.debug(f"   Duplicate event, already seen: {file_path.name}")
             return
         
-        logger.info(f"✅ New file, not yet processed")
-        
-        # Wait a moment for file to be fully written
-        logger.info(f"   Waiting 2 seconds for file to stabilize...")
-        time.sleep(2)
-        
-        # Verify file exists and is readable
-        if not file_path.exists():
-            logger.error(f"❌ File disappeared: {file_path.name}")
+        # Check if already processed (prevent duplicates)
+        logger.debug(f"   Checking if already processed...")
+        logger.debug(f"   Processed files count: {len(self.processed_files)}")
+        if self._is_processed(file_path):
+            logger.debug(f"⚠️ File already processed, skipping: {file_path.name}")
             return
         
-        logger.info(f"✅ File still exists after wait")
-        
-        # Check file size to ensure it's not empty or still being written
-        try:
-            initial_size = file_path.stat().st_size
-            logger.info(f"   Initial file size: {initial_size} bytes ({initial_size/1024/1024:.2f} MB)")
-            time.sleep(1)
-            current_size = file_path.stat().st_size
-            logger.info(f"   Current file size: {current_size} bytes ({current_size/1024/1024:.2f} MB)")
-            
-            if current_size != initial_size:
-                logger.warning(f"⚠️ File still being written (size changed), waiting 3 more seconds...")
-                logger.info(f"   Size changed: {initial_size} -> {current_size}")
-                time.sleep(3)
-                final_size = file_path.stat().st_size
-                logger.info(f"   Final file size: {final_size} bytes ({final_size/1024/1024:.2f} MB)")
-            else:
-                logger.info(f"✅ File size stable, ready to process")
-        except Exception as e:
-            logger.error(f"❌ Error checking file size: {e}")
-            return
+        logger.info(f"📥 New video detected: {file_path.name}")
         
-        # Process the NEW file
-        logger.info(f"🚀 Starting watermark removal process for: {file_path.name}")
-        self._process_video(file_path)
+        # Hand off to the stabilizer thread, which waits for the file to be fully written
+        self._pending.put((file_path, prefix, 0, STABILITY_INTERVAL))
     
-    def on_moved(self, event):
+    def on_moved(self, event, prefix: str):
         """Called when a file is moved/renamed - only process NEW files moved INTO the folder."""
-        logger.info(f"📁 FILE MOVED EVENT: {event.src_path} -> {event.dest_path}")
-        
-        if event.is_directory:
-            logger.debug(f"   Skipping directory move")
-            return
-        
+        logger.debug(f"📁 FILE MOVED EVENT: {event.src_path} -> {event.dest_path}")
+        logger.debug(f"✅ Pattern matched: {prefix}")
         dest_path = Path(event.dest_path)
-        logger.info(f"   Destination: {dest_path}")
-        logger.info(f"   File name: {dest_path.name}")
-        
-        # Only process MP4 files
-        if dest_path.suffix.lower() != '.mp4':
-            logger.debug(f"   Skipping non-MP4 file: {dest_path.name}")
-            return
-        
-        logger.info(f"✅ MP4 file moved: {dest_path.name}")
-        
-        # Check if file matches pattern (YYYYMMDD_TIME_*.mp4)
-        pattern_match = self.pattern.match(dest_path.name)
-        logger.info(f"   Pattern check: {pattern_match}")
-        if not pattern_match:
-            logger.warning(f"⚠️ File doesn't match pattern: {dest_path.name}")
-            return
         
         # Only process if file was moved INTO the watched folder or any subfolder (not out of it)
         # Check if the destination is within the input folder (supports nested folders)
         try:
-            dest_resolved = dest_path.resolve()
-            input_resolved = self.input_folder.resolve()
-            is_inside = str(dest_resolved).startswith(str(input_resolved) + '/')
-            logger.info(f"   File moved inside watched folder: {is_inside}")
+            is_inside = event.dest_path.startswith(self._input_resolved_prefix)
+            if not is_inside:
+                # Path may be unresolved (e.g. via a symlink); only then pay for resolve()
+                is_inside = str(dest_path.resolve()).startswith(self._input_resolved_prefix)
+            logger.debug(f"   File moved inside watched folder: {is_inside}")
             if not is_inside:
                 logger.debug(f"   File moved outside watched folder, skipping")
                 return  # File moved outside watched folder
@@ -404,48 +1133,29 @@ class VideoProcessor(FileSystemEventHandler):
             # Fallback to samefile check for direct children
             try:
                 is_same = dest_path.parent.samefile(self.input_folder)
-                logger.info(f"   Fallback check (samefile): {is_same}")
+                logger.debug(f"   Fallback check (samefile): {is_same}")
                 if not is_same:
                     return
             except Exception as e2:
                 logger.error(f"   Fallback check failed: {e2}")
                 return
         
-        # Check if already processed (prevent duplicates)
+        # Drop repeated events for the same path before any stat or DB lookup
         file_path_str = str(dest_path)
-        if file_path_str in self.processed_files:
-            logger.warning(f"⚠️ File already processed, skipping: {dest_path.name}")
+        if self._is_duplicate_event(file_path_str):
+            logger.debug(f"   Duplicate event, already seen: {dest_path.name}")
             return
         
-        logger.info(f"✅ New file moved in, not yet processed")
-        
-        # Wait a moment for file to be fully written
-        logger.info(f"   Waiting 2 seconds for file to stabilize...")
-        time.sleep(2)
-        
-        # Verify file exists
-        if not dest_path.exists():
-            logger.error(f"❌ File doesn't exist: {dest_path.name}")
+        # Check if already processed (prevent duplicates)
+        if self._is_processed(dest_path):
+            logger.debug(f"⚠️ File already processed, skipping: {dest_path.name}")
             return
         
-        logger.info(f"✅ File exists after wait")
-        
-        # Check file size to ensure it's not empty or still being written
-        try:
-            initial_size = dest_path.stat().st_size
-            logger.info(f"   Initial file size: {initial_size} bytes")
-            time.sleep(1)
-            current_size = dest_path.stat().st_size
-            if current_size != initial_size:
-                logger.warning(f"⚠️ File still being written, waiting 3 more seconds...")
-                time.sleep(3)
-        except Exception as e:
-            logger.error(f"❌ Error checking file size: {e}")
-            return
+        logger.info(f"📥 New video moved in: {dest_path.name}")
         
-        # Process the NEW file
-        logger.info(f"🚀 Starting watermark removal process for moved file: {dest_path.name}")
-        self._process_video(dest_path)
+        # Hand off to the stabilizer thread, which waits for the file to be fully written
+        # A rename usually means the writer is done (e.g. a browser download finishing), so check quickly
+        self._pending.put((dest_path, prefix, 0, MOVED_STABILITY_INTERVAL))
 
 
 def main():
@@ -473,9 +1183,41 @@ def main():
     # Initialize processor
     event_handler = VideoProcessor(input_folder, output_folder)
     
-    # Set up observer
-    observer = Observer()
-    observer.schedule(event_handler, str(input_folder), recursive=True)  # Recursive to catch nested folders like "Big Downloads/Big Downloads"
+    # Set up observer. FSEvents can miss or delay events on iCloud Drive folders;
+    # SORAWM_OBSERVER=polling lists the watched folders every SORAWM_POLL_INTERVAL seconds instead
+    polling = os.environ.get("SORAWM_OBSERVER", "native").lower() == "polling"
+    if polling:
+        poll_interval = float(os.environ.get("SORAWM_POLL_INTERVAL", "15"))
+        observer = PollingObserver(timeout=poll_interval)
+        logger.info(f"Using polling observer (every {poll_interval:g}s)")
+    else:
+        observer = Observer()
+    # The native observer gets one recursive watch; FSEvents streams are recursive anyway,
+    # and dispatch() drops the irrelevant events. The polling observer would list every
+    # folder in the tree on each poll, so it gets one non-recursive watch per folder
+    # (input folder plus nested folders like "Big Downloads/Big Downloads") instead
+    watches = {}
+    
+    def sync_watches():
+        """Schedule newly created subfolders and drop watches on removed ones (polling only)."""
+        if not polling:
+            if not watches:
+                watches[str(input_folder)] = observer.schedule(event_handler, str(input_folder), recursive=True)
+            return
+        folders = {str(p) for p in watched_folders(input_folder)}
+        for folder in folders - watches.keys():
+            try:
+                watches[folder] = observer.schedule(event_handler, folder, recursive=False)
+                logger.debug(f"👀 Watching folder: {folder}")
+            except OSError as e:
+                logger.warning(f"Could not watch folder {folder}: {e}")
+        for folder in watches.keys() - folders:
+            try:
+                observer.unschedule(watches.pop(folder))
+            except Exception as e:
+                logger.debug(f"Could not unwatch folder {folder}: {e}")
+    
+    sync_watches()
     
     logger.info("Starting file watcher...")
     logger.info(f"Watching: {input_folder}")
@@ -495,38 +1237,35 @@ def main():
         # On startup, ONLY process the NEWEST file that hasn't been processed yet
         # Simple: find newest unprocessed file and process it
         logger.info("Checking for newest unprocessed file...")
-        existing_files = list(input_folder.rglob("*.mp4"))  # Recursive glob to find files in nested folders
-        matching_files = [f for f in existing_files if event_handler.pattern.match(f.name)]
+        matching_files = event_handler.indexed_files()  # Indexed recursively at startup, includes nested folders
+        existing_outputs = event_handler.output_names()  # Listed at startup instead of a stat per file
         
-        # Filter to only unprocessed files (not in tracking)
-        unprocessed_files = []
+        # Single pass: count unprocessed files and keep the one with the newest filename timestamp
+        unprocessed_count = 0
+        newest_file = None
+        newest_ts = -1
         for mp4_file in matching_files:
             file_path_str = str(mp4_file)
             # Skip if already processed (tracked)
             if file_path_str in event_handler.processed_files:
                 logger.debug(f"Skipping already processed: {mp4_file.name}")
                 continue
-            unprocessed_files.append(mp4_file)
-        
-        if unprocessed_files:
-            # Sort by filename timestamp (download time) - newest first
-            def get_timestamp(file_path):
-                match = event_handler.pattern.match(file_path.name)
-                if match:
-                    date_str = match.group(1)  # YYYYMMDD
-                    time_str = match.group(2)  # HHMM
-                    return int(date_str + time_str)  # YYYYMMDDHHMM
-                return 0
-            
-            unprocessed_files.sort(key=get_timestamp, reverse=True)  # Newest download first
-            
-            # ONLY process the NEWEST unprocessed file
-            newest_file = unprocessed_files[0]
-            logger.info(f"Found {len(unprocessed_files)} unprocessed file(s), processing NEWEST: {newest_file.name}")
-            event_handler._process_video(newest_file)
+            # Skip if its output already exists (processed before tracking knew about it)
+            if generate_output_filename(mp4_file.name) in existing_outputs:
+                logger.debug(f"Skipping, output already exists: {mp4_file.name}")
+                continue
+            unprocessed_count += 1
+            ts = filename_timestamp(mp4_file.name)
+            if ts > newest_ts:
+                newest_file, newest_ts = mp4_file, ts
+        
+        if newest_file is not None:
+            # ONLY process the NEWEST unprocessed file (by download time)
+            logger.info(f"Found {unprocessed_count} unprocessed file(s), processing NEWEST: {newest_file.name}")
+            event_handler.submit_video(newest_file)
             
-            if len(unprocessed_files) > 1:
-                logger.info(f"Skipping {len(unprocessed_files) - 1} older unprocessed file(s) - only processing newest")
+            if unprocessed_count > 1:
+                logger.info(f"Skipping {unprocessed_count - 1} older unprocessed file(s) - only processing newest")
         else:
             logger.info("No unprocessed files found - all existing files already processed")
         
@@ -534,73 +1273,101 @@ def main():
         
         # Periodically check for files that might have been missed by file system events
         # Also verify that processed files actually have output files (in case processing failed)
+        # Passes work from the in-memory index and output names; the disk is only re-scanned every RESCAN_INTERVAL.
+        # The wait backs off while passes come up empty, and a failure wakes it immediately.
         def periodic_check():
+            interval = PERIODIC_CHECK_MIN_INTERVAL
+            last_rescan = time.monotonic()
             while True:
-                time.sleep(30)  # Check every 30 seconds
+                triggered = event_handler._recheck.wait(timeout=interval)
+                event_handler._recheck.clear()
                 try:
                     logger.debug("🔄 Periodic check for missed/unprocessed files...")
-                    existing_files = list(input_folder.rglob("*.mp4"))
-                    matching_files = [f for f in existing_files if event_handler.pattern.match(f.name)]
+                    if time.monotonic() - last_rescan >= RESCAN_INTERVAL:
+                        logger.debug("🔄 Re-scanning input folder to reconcile index...")
+                        event_handler.rescan_index()
+                        sync_watches()
+                        last_rescan = time.monotonic()
+                    matching_files = event_handler.indexed_files()
+                    existing_outputs = event_handler.output_names()
                     
                     new_unprocessed = []
                     for mp4_file in matching_files:
                         file_path_str = str(mp4_file)
-                        output_filename = event_handler._generate_output_filename(mp4_file.name)
-                        output_path = output_folder / output_filename
+                        if event_handler.is_in_flight(mp4_file):
+                            continue  # Output won't exist until the worker finishes it
+                        if event_handler.is_backing_off(mp4_file):
+                            continue  # Failed recently; retried on a later pass
+                        output_exists = generate_output_filename(mp4_file.name) in existing_outputs
                         
                         # If file is marked as processed but output doesn't exist, it wasn't actually processed
                         if file_path_str in event_handler.processed_files:
-                            if not output_path.exists():
+                            if not output_exists:
                                 logger.warning(f"⚠️ File marked as processed but output missing: {mp4_file.name}")
                                 logger.info(f"   Removing from processed list and will reprocess")
-                                event_handler.processed_files.discard(file_path_str)
-                                # Also remove from tracking file
-                                try:
-                                    if event_handler.tracking_file.exists():
-                                        lines = []
-                                        with open(event_handler.tracking_file, 'r') as f:
-                                            for line in f:
-                                                if line.strip() != file_path_str:
-                                                    lines.append(line)
-                                        with open(event_handler.tracking_file, 'w') as f:
-                                            f.writelines(lines)
-                                except Exception as e:
-                                    logger.error(f"Error updating tracking file: {e}")
+                                event_handler._forget_processed_file(file_path_str)
                                 new_unprocessed.append(mp4_file)
                         elif file_path_str not in event_handler.processed_files:
                             # File not in processed list - check if output exists
-                            if not output_path.exists():
+                            if not output_exists:
                                 logger.info(f"🔍 Found unprocessed file: {mp4_file.name}")
                                 new_unprocessed.append(mp4_file)
                     
-                    if new_unprocessed:
-                        # Sort by timestamp, newest first
-                        def get_timestamp(file_path):
-                            match = event_handler.pattern.match(file_path.name)
-                            if match:
-                                date_str = match.group(1)
-                                time_str = match.group(2)
-                                return int(date_str + time_str)
-                            return 0
-                        new_unprocessed.sort(key=get_timestamp, reverse=True)
-                        newest = new_unprocessed[0]
+                    # Newest by filename timestamp; files iCloud hasn't downloaded yet are
+                    # deferred so they don't hold up the older ones
+                    submitted = False
+                    for newest in sorted(new_unprocessed, key=lambda f: filename_timestamp(f.name), reverse=True):
+                        try:
+                            st = newest.stat()
+                        except OSError:
+                            # Deleted since it was indexed; drop it until the next re-scan
+                            event_handler.forget_file(newest)
+                            continue
+                        if is_icloud_placeholder(newest, st):
+                            event_handler._defer_icloud_placeholder(newest)
+                            continue
                         logger.info(f"🚀 Processing missed/unprocessed file: {newest.name}")
-                        event_handler._process_video(newest)
+                        event_handler.submit_video(newest)
+                        submitted = True
+                        break
+                    
+                    # Back off while there is nothing to do (waiting on iCloud downloads included);
+                    # check again soon otherwise
+                    if triggered or submitted:
+                        interval = PERIODIC_CHECK_MIN_INTERVAL
+                    else:
+                        interval = min(interval * 2, PERIODIC_CHECK_MAX_INTERVAL)
                 except Exception as e:
                     logger.error(f"Error in periodic check: {e}")
         
         check_thread = threading.Thread(target=periodic_check, daemon=True)
         check_thread.start()
-        logger.info("✅ Periodic check thread started (every 30 seconds)")
+        logger.info(f"✅ Periodic check thread started (every {PERIODIC_CHECK_MIN_INTERVAL}s, backing off to {PERIODIC_CHECK_MAX_INTERVAL // 60} min when idle)")
         
-        # Keep running
-        while True:
-            time.sleep(1)
+        # Keep running: block until Ctrl+C or a termination signal (e.g. launchctl unload)
+        stop = threading.Event()
+        
+        def handle_signal(signum, frame):
+            """First signal stops gracefully; a second one also kills running videos."""
+            if not stop.is_set():
+                stop.set()
+                return
+            logger.warning("Stopping running videos now...")
+            # Off the signal handler, which may have interrupted the main thread inside a lock
+            threading.Thread(target=event_handler.abort, daemon=True).start()
+        
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+        stop.wait()
+        logger.info("Stopping file watcher...")
+        observer.stop()
     except KeyboardInterrupt:
         logger.info("Stopping file watcher...")
         observer.stop()
     
     observer.join()
+    logger.info("Waiting for running videos to finish (Ctrl+C again to stop them now)...")
+    event_handler.close()
     logger.info("File watcher stopped.")
 
 